@@ -21,18 +21,41 @@ from flask import Flask
 from app.config import Config
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from flask_caching import Cache
 from redis import Redis
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 import rq
 from app import Config
+from app.json_codec import ORJSONEncoder, ORJSONDecoder
 import logging
+import sqlite3
+
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL mode lets clients polling results read while workers write them
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA cache_size=-65536")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.close()
+
 
 app = Flask(__name__)
 app.config.from_object(Config)
+app.json_encoder = ORJSONEncoder
+app.json_decoder = ORJSONDecoder
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
+cache = Cache(app)
 
-from app import routes, result_model, errors
+from app import routes, result_model, errors, tket_handler
 
 app.redis = Redis.from_url(app.config['REDIS_URL'], port=5040)
 app.execute_queue = rq.Queue('pytket-service_execute', connection=app.redis, default_timeout=3600)
 app.logger.setLevel(logging.INFO)
+
+tket_handler.warm_backends(app.config['WARM_BACKENDS'], logger=app.logger.warn)
@@ -18,6 +18,7 @@
 # ******************************************************************************
 
 import os
+from sqlalchemy.pool import QueuePool
 
 basedir = os.path.join(os.path.abspath(os.path.dirname(__file__)), "data")
 
@@ -25,5 +26,42 @@ basedir = os.path.join(os.path.abspath(os.path.dirname(__file__)), "data")
 class Config(object):
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # keep SQLite connections open and share them between threads instead of reconnecting for every session
+    SQLALCHEMY_ENGINE_OPTIONS = {'poolclass': QueuePool, 'connect_args': {'check_same_thread': False}} \
+        if SQLALCHEMY_DATABASE_URI.startswith('sqlite') else {}
 
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:5040'
+
+    # in-process cache for completed results
+    CACHE_TYPE = 'SimpleCache'
+    CACHE_DEFAULT_TIMEOUT = 60
+
+    # lifetime of cached transpilation results in seconds
+    TRANSPILE_CACHE_TTL = int(os.environ.get('TRANSPILE_CACHE_TTL') or 24 * 60 * 60)
+
+    # number of downloaded implementations to keep and seconds until they are revalidated
+    IMPL_CACHE_SIZE = 256
+    IMPL_CACHE_TTL = 5 * 60
+
+    # number of worker processes transpiling the circuits of batch requests, per gunicorn worker,
+    # so the cores are shared by the gunicorn workers (WEB_CONCURRENCY, 4 in the Dockerfile)
+    TRANSPILE_BATCH_WORKERS = int(os.environ.get('TRANSPILE_BATCH_WORKERS')
+                                  or max(1, (os.cpu_count() or 1) // int(os.environ.get('WEB_CONCURRENCY') or 4)))
+
+    # seconds and number of results after which new result entries are committed
+    RESULT_BATCH_INTERVAL = 0.05
+    RESULT_BATCH_SIZE = 100
+    # seconds after which an uncommitted result entry is reported as lost,
+    # and seconds the state of uncommitted result entries, or the error of failed ones, is kept
+    RESULT_PENDING_TTL = 10 * 60
+    RESULT_FAILED_TTL = 24 * 60 * 60
+
+    # seconds a client may wait for a result on the result stream, waiting streams do not occupy a worker,
+    # as gunicorn runs gevent workers (see Dockerfile)
+    RESULT_STREAM_TIMEOUT = 60 * 60
+    # seconds between keep-alive comments on the result stream
+    RESULT_STREAM_HEARTBEAT = 15
+
+    # backends created at startup, given as comma-separated provider:qpu-name pairs, e.g. ibmq:ibmq_lima
+    WARM_BACKENDS = [tuple(backend.split(':', 1)) for backend in (os.environ.get('WARM_BACKENDS') or '').split(',')
+                     if ':' in backend]
@@ -0,0 +1,175 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import atexit
+import queue
+import threading
+import time
+
+from app import app, db
+from app.result_model import Result, compress_result, get_result_channel
+
+# state of a result entry that was added but not committed yet, otherwise the state holds the error
+PENDING = 'pending'
+
+
+class ResultBatcher(object):
+    """
+    Inserts result entries from a background thread, committing all entries added within a short interval at once.
+    Callbacks of an entry, e.g. enqueueing its job, are only invoked after the entry was committed.
+    The state of uncommitted entries is kept in Redis, so it is visible to all gunicorn workers.
+    """
+
+    def __init__(self, flush_interval, max_batch_size):
+        self._flush_interval = flush_interval
+        self._max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, row, on_commit=None):
+        """
+        Add a result entry to the next batch.
+        :param row: the column values of the result
+        :param on_commit: function called after the entry was committed
+        :return:
+        """
+
+        # kept as long as errors, so an entry that is never stored can still be reported, see get_state
+        app.redis.set(_get_state_key(row['id']), PENDING, ex=app.config['RESULT_FAILED_TTL'])
+
+        with self._lock:
+            # started on first use, so every gunicorn worker runs its own thread
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="result-batcher", daemon=True)
+                self._thread.start()
+                atexit.register(self._flush_remaining)
+
+        self._queue.put((row, on_commit))
+
+    def get_state(self, result_id):
+        """
+        Get the state of a result entry that is not committed.
+        :param result_id:
+        :return: None if the entry is unknown or committed, PENDING if it is not committed yet,
+                 otherwise the error that prevented storing it
+        """
+
+        key = _get_state_key(result_id)
+        state = app.redis.get(key)
+        if not state:
+            return None
+
+        state = state.decode()
+        if state == PENDING and app.config['RESULT_FAILED_TTL'] - app.redis.ttl(key) > app.config['RESULT_PENDING_TTL']:
+            # the process holding the entry was killed before storing it
+            return "result was lost before it was stored"
+        return state
+
+    def flush(self):
+        """Block until all added entries were processed."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._flush_interval
+
+            while len(batch) < self._max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                self._insert(batch)
+            except Exception as e:
+                # keep the thread alive, e.g. if Redis is not reachable
+                app.logger.error(f"Failed to process batch of {len(batch)} results: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _flush_remaining(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        if batch:
+            self._insert(batch)
+
+    def _insert(self, batch):
+        with app.app_context():
+            try:
+                db.session.bulk_insert_mappings(Result, [row for row, _ in batch])
+                db.session.commit()
+                stored = batch
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Failed to store {len(batch)} results, storing them one by one: {str(e)}")
+                stored = [(row, on_commit) for row, on_commit in batch if self._insert_one(row)]
+
+            for row, on_commit in stored:
+                app.redis.delete(_get_state_key(row['id']))
+                if not on_commit:
+                    continue
+                try:
+                    on_commit()
+                except Exception as e:
+                    app.logger.error(f"Failed to process stored result {row['id']}: {str(e)}")
+                    self._store_error(row['id'], f"failed to process result: {str(e)}")
+
+            db.session.remove()
+
+    def _insert_one(self, row):
+        try:
+            db.session.bulk_insert_mappings(Result, [row])
+            db.session.commit()
+            return True
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Failed to store result {row['id']}: {str(e)}")
+            # keep the error where clients polling the result find it
+            app.redis.set(_get_state_key(row['id']), f"failed to store result: {str(e)}",
+                          ex=app.config['RESULT_FAILED_TTL'])
+            return False
+
+    def _store_error(self, result_id, error):
+        try:
+            result = Result.query.get(result_id)
+            result.result = compress_result({'error': error})
+            result.complete = True
+            db.session.commit()
+            app.redis.publish(get_result_channel(result_id), 1)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Failed to store error of result {result_id}: {str(e)}")
+
+
+def _get_state_key(result_id):
+    return 'result-state:' + result_id
+
+
+result_batcher = ResultBatcher(app.config['RESULT_BATCH_INTERVAL'], app.config['RESULT_BATCH_SIZE'])
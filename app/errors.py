@@ -22,15 +22,15 @@ from app import app
 
 
 @app.errorhandler(500)
-def internal_server():
+def internal_server(error):
     return make_response(jsonify({'error': 'Internal Server Error', 'statusCode': '500'}), 500)
 
 
 @app.errorhandler(404)
-def not_found():
+def not_found(error):
     return make_response(jsonify({'error': 'Not found', 'statusCode': '404'}), 404)
 
 
 @app.errorhandler(400)
-def bad_request():
+def bad_request(error):
     return make_response(jsonify({'error': 'Bad Request', 'statusCode': '400'}), 400)
@@ -0,0 +1,93 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+
+from app import app
+
+CachedSource = namedtuple('CachedSource', ['source', 'etag', 'last_modified', 'fetched_at'])
+
+# downloaded implementations by URL and bearer token, in least recently used order
+_sources = OrderedDict()
+_sources_lock = threading.Lock()
+
+
+def _get_key(url, bearer_token):
+    # different bearer tokens may grant access to different content for the same URL
+    return url, hashlib.sha256(bearer_token.encode()).hexdigest()
+
+
+def get_source(url, bearer_token: str = ""):
+    """
+    Get the cached implementation downloaded from the given URL.
+    :param url:
+    :param bearer_token:
+    :return: the CachedSource or None if the URL was not downloaded before
+    """
+
+    key = _get_key(url, bearer_token)
+    with _sources_lock:
+        cached = _sources.get(key)
+        if cached:
+            _sources.move_to_end(key)
+    return cached
+
+
+def is_fresh(cached):
+    """
+    Check if the cached implementation can be used without revalidating it at the server.
+    :param cached:
+    :return:
+    """
+
+    return time.monotonic() - cached.fetched_at < app.config['IMPL_CACHE_TTL']
+
+
+def store_source(url, bearer_token, source, etag=None, last_modified=None):
+    """
+    Store the implementation downloaded from the given URL together with its validators.
+    :param url:
+    :param bearer_token:
+    :param source: the implementation code
+    :param etag: the ETag header of the response
+    :param last_modified: the Last-Modified header of the response
+    :return:
+    """
+
+    key = _get_key(url, bearer_token)
+    with _sources_lock:
+        _sources[key] = CachedSource(source, etag, last_modified, time.monotonic())
+        _sources.move_to_end(key)
+        while len(_sources) > app.config['IMPL_CACHE_SIZE']:
+            _sources.popitem(last=False)
+
+
+@lru_cache(maxsize=256)
+def compile_source(source):
+    """
+    Compile the implementation code once, so repeated executions skip parsing it.
+    :param source:
+    :return: the code object
+    """
+
+    return compile(source, "downloaded_code.py", "exec")
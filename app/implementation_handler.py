@@ -19,16 +19,14 @@
 
 import urllib
 from urllib import request, error
-import tempfile
-import os, sys, shutil, re
-from importlib import reload
+import types
 
 from flask_restful import abort
 from pytket.qasm import circuit_from_qasm_str
 from pyquil import Program as PyQuilProgram
 from urllib3 import HTTPResponse
 
-from app import app
+from app import app, impl_cache
 
 
 def prepare_code(impl_url, impl_data, impl_language, input_params, bearer_token: str = ""):
@@ -36,30 +34,15 @@ def prepare_code(impl_url, impl_data, impl_language, input_params, bearer_token:
     if impl_url:
         # Download and execute the implementation
         if impl_language.lower() == "openqasm":
-            match = re.match(".*/(?P<file>.*\\.qasm)", impl_url)
-
-            if match is None:
-                short_impl_name = "undefined"
-            else:
-                short_impl_name = match.group('file')
+            short_impl_name = _get_short_impl_name(impl_url, ".qasm")
 
             circuit = prepare_code_from_qasm_url(impl_url, bearer_token)
         elif impl_language.lower() == "quil":
-            match = re.match(".*/(?P<file>.*\\.quil)", impl_url)
-
-            if match is None:
-                short_impl_name = "undefined"
-            else:
-                short_impl_name = match.group('file')
+            short_impl_name = _get_short_impl_name(impl_url, ".quil")
 
             circuit = prepare_code_from_quil_url(impl_url, bearer_token)
         else:
-            match = re.match(".*/(?P<file>.*\\.py)", impl_url)
-
-            if match is None:
-                short_impl_name = "undefined"
-            else:
-                short_impl_name = match.group('file')
+            short_impl_name = _get_short_impl_name(impl_url, ".py")
 
             circuit = prepare_code_from_url(impl_url, input_params, bearer_token)
 
@@ -77,34 +60,38 @@ def prepare_code(impl_url, impl_data, impl_language, input_params, bearer_token:
     return circuit, short_impl_name
 
 
+def get_source(impl_url, impl_data, bearer_token: str = ""):
+    """Get the code of the implementation, downloading it if required. Return None if it cannot be downloaded."""
+    if not impl_url:
+        return impl_data
+
+    try:
+        # revalidated at the server once the cached download is stale
+        return _download_code(impl_url, bearer_token)
+    except Exception:
+        # the error is reported when preparing the code
+        return None
+
+
+def _get_short_impl_name(impl_url, extension):
+    """Get the file name of the implementation from its URL, or "undefined" if it has another extension."""
+    file_name = urllib.parse.urlparse(impl_url).path.rpartition('/')[2]
+    return file_name if file_name.endswith(extension) else "undefined"
+
+
 def prepare_code_from_data(data, input_params):
     """Get implementation code from data. Set input parameters into implementation. Return circuit."""
-    temp_dir = tempfile.mkdtemp()
-    with open(os.path.join(temp_dir, "__init__.py"), "w") as f:
-        f.write("")
-    with open(os.path.join(temp_dir, "downloaded_code.py"), "w") as f:
-        f.write(data)
-    sys.path.append(temp_dir)
+    # execute the (cached) compiled code in a fresh module, so no globals of previous executions remain
+    downloaded_code = types.ModuleType("downloaded_code")
+    exec(impl_cache.compile_source(data), downloaded_code.__dict__)
+
     circuit = None
-    try:
-        import downloaded_code
-
-        # deletes every attribute from downloaded_code, except __name__, because importlib.reload
-        # doesn't reset the module's global variables
-        for attr in dir(downloaded_code):
-            if attr != "__name__":
-                delattr(downloaded_code, attr)
-
-        reload(downloaded_code)
-        if 'get_circuit' in dir(downloaded_code):
-            circuit = downloaded_code.get_circuit(**input_params)
-        elif 'qc' in dir(downloaded_code):
-            circuit = downloaded_code.qc
-        elif 'p' in dir(downloaded_code):
-            circuit = downloaded_code.p
-    finally:
-        sys.path.remove(temp_dir)
-        shutil.rmtree(temp_dir, ignore_errors=True)
+    if 'get_circuit' in dir(downloaded_code):
+        circuit = downloaded_code.get_circuit(**input_params)
+    elif 'qc' in dir(downloaded_code):
+        circuit = downloaded_code.qc
+    elif 'p' in dir(downloaded_code):
+        circuit = downloaded_code.p
     if not circuit:
         raise ValueError
     return circuit
@@ -150,6 +137,10 @@ def prepare_code_from_quil_url(url, bearer_token: str = ""):
 
 
 def _download_code(url: str, bearer_token: str = "") -> str:
+    cached = impl_cache.get_source(url, bearer_token)
+    if cached and impl_cache.is_fresh(cached):
+        return cached.source
+
     req = request.Request(url)
 
     if urllib.parse.urlparse(url).netloc == "platform.planqk.de":
@@ -164,9 +155,19 @@ def _download_code(url: str, bearer_token: str = "") -> str:
 
         req.add_header("Authorization", "Bearer " + bearer_token)
 
+    # only download the code again if it changed since it was cached
+    if cached and cached.etag:
+        req.add_header("If-None-Match", cached.etag)
+    if cached and cached.last_modified:
+        req.add_header("If-Modified-Since", cached.last_modified)
+
     try:
         res: HTTPResponse = request.urlopen(req)
     except Exception as e:
+        if cached and isinstance(e, error.HTTPError) and e.code == 304:
+            impl_cache.store_source(url, bearer_token, cached.source, cached.etag, cached.last_modified)
+            return cached.source
+
         app.logger.error("Could not open url: " + str(e))
 
         if str(e).find("401") != -1:
@@ -178,4 +179,6 @@ def _download_code(url: str, bearer_token: str = "") -> str:
     if res.getcode() == 401:
         abort(401)
 
-    return res.read().decode("utf-8")
+    source = res.read().decode("utf-8")
+    impl_cache.store_source(url, bearer_token, source, res.headers.get("ETag"), res.headers.get("Last-Modified"))
+    return source
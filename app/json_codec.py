@@ -0,0 +1,45 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import orjson
+from flask.json import JSONEncoder, JSONDecoder
+
+
+class ORJSONEncoder(JSONEncoder):
+    """
+    Serializes responses with orjson, types unknown to orjson are handled by the default Flask encoder
+    """
+
+    def encode(self, o):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.indent:
+            option |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(o, default=self.default, option=option).decode()
+
+
+class ORJSONDecoder(JSONDecoder):
+    """
+    Parses request bodies with orjson
+    """
+
+    def decode(self, s, _w=None):
+        return orjson.loads(s)
@@ -78,3 +78,19 @@ class ParameterDictionary(dict):
             t_value = value
 
         super(ParameterDictionary, self).__setitem__(key.lower(), t_value)
+
+
+# Parameters only used to authenticate at the provider, they do not affect the compiled circuit
+credential_parameters = frozenset({'token', 'hub', 'group', 'project'})
+
+
+def split_credential_parameters(input_params):
+    """
+    Splits the given parameters into credential parameters and parameters affecting the compilation.
+    :param input_params:
+    :return: tuple of the credential parameters and the remaining parameters
+    """
+
+    credential_params = {k: v for k, v in input_params.items() if k in credential_parameters}
+    compile_params = {k: v for k, v in input_params.items() if k not in credential_parameters}
+    return credential_params, compile_params
@@ -18,14 +18,33 @@
 # ******************************************************************************
 
 from app import db
+import orjson
+import zstandard
 
 
 class Result(db.Model):
     id = db.Column(db.String(36), primary_key=True)
     backend = db.Column(db.String(1200), default="")
     shots = db.Column(db.Integer, default=0)
-    result = db.Column(db.String(1200), default="")
+    result = db.Column(db.LargeBinary, default=b"")
     complete = db.Column(db.Boolean, default=False)
 
+    __table_args__ = (db.Index('ix_result_id_complete', 'id', 'complete'),)
+
     def __repr__(self):
         return 'Result {}'.format(self.result)
+
+
+def compress_result(result):
+    """Serialize the result to compressed JSON as stored in the result column."""
+    return zstandard.ZstdCompressor().compress(orjson.dumps(result))
+
+
+def decompress_result(data):
+    """Get the serialized JSON of a result stored in the result column."""
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def get_result_channel(result_id):
+    """Get the Redis channel on which the completion of the result is published."""
+    return 'result:' + result_id
@@ -17,34 +17,58 @@
 #  limitations under the License.
 # ******************************************************************************
 
-from app import app, implementation_handler, db, parameters
-from app.result_model import Result
-from app.tket_handler import get_backend, is_tk_circuit, setup_credentials, tket_analyze_original_circuit, \
-    tket_transpile_circuit, UnsupportedGateException, TooManyQubitsException, get_depth_without_barrier, \
-    prepare_transpile_response, get_number_of_multi_qubit_gates, get_multi_qubit_gate_depth, \
-    get_number_of_measurement_operations
-
-from flask import jsonify, abort, request
+from app import app, implementation_handler, transpile_handler, db, cache, parameters
+from app.result_model import Result, decompress_result, get_result_channel
+from app.db_batcher import result_batcher, PENDING
+from app.tket_handler import is_tk_circuit, needs_precompile, tket_analyze_original_circuit, UnsupportedGateException
+
+from flask import jsonify, abort, request, Response, stream_with_context
+from functools import wraps
 import logging
-import json
+import orjson
 import base64
+import time
+import uuid
 
+# fields required in the request bodies
+analyze_fields = frozenset({'impl-language'})
+transpile_fields = frozenset({'qpu-name', 'provider', 'impl-language'})
+batch_fields = frozenset({'items'})
+execute_fields = frozenset({'qpu-name', 'provider'})
+
+result_location = '/pytket-service/api/v1.0/results/%s'
+result_location_body = '{"Location":"' + result_location + '"}'
+
+
+def requires_json(required_fields):
+    """Parse the JSON body of the request once and pass it to the route. Abort if a required field is missing."""
+
+    def decorator(route):
+        @wraps(route)
+        def wrapper(*args, **kwargs):
+            body = request.get_json()
+            if not isinstance(body, dict) or not required_fields <= body.keys():
+                abort(400)
+            return route(body, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
 
-@app.route('/pytket-service/api/v1.0/analyze-original-circuit', methods=['POST'])
-def analyze_original_circuit():
-    if not request.json or not 'impl-language' in request.json:
-        abort(400)
 
-    impl_language = request.json["impl-language"]
+@app.route('/pytket-service/api/v1.0/analyze-original-circuit', methods=['POST'])
+@requires_json(analyze_fields)
+def analyze_original_circuit(body):
+    impl_language = body["impl-language"]
 
     circuit = None
     short_impl_name = ""
 
-    impl_url = request.json['impl-url'] if 'impl-url' in request.json else None
+    impl_url = body.get('impl-url')
     impl_data = base64.standard_b64decode(
-        request.json['impl-data'].encode()).decode() if 'impl-data' in request.json else None
+        body['impl-data'].encode()).decode() if 'impl-data' in body else None
 
-    bearer_token = request.json.get("bearer-token", "")
+    bearer_token = body.get("bearer-token", "")
 
     try:
         circuit, short_impl_name = implementation_handler.prepare_code(impl_url, impl_data, impl_language, {'token': ''},
@@ -66,8 +90,7 @@ def analyze_original_circuit():
     non_transpiled_number_of_measurement_operations = None
     non_transpiled_number_of_single_qubit_gates = None
 
-    precompiled_circuit = False
-    while not is_tk_circuit(circuit):
+    if not is_tk_circuit(circuit):
 
         try:
             circuit, \
@@ -82,21 +105,12 @@ def analyze_original_circuit():
                                                 impl_language=impl_language,
                                                 short_impl_name=short_impl_name,
                                                 logger=app.logger.info,
-                                                precompile_circuit=precompiled_circuit)
+                                                precompile_circuit=needs_precompile(circuit, impl_language))
 
         except UnsupportedGateException as e:
-
             # unsupported gate type caused circuit conversion to fail
             app.logger.warn(f"Unsupported gate ({e.gate}) in implementation {short_impl_name}.")
 
-            # precompile the circuit and retry
-            if not precompiled_circuit:
-                precompiled_circuit = True
-                continue
-            else:
-                app.logger.warn(f"Precompiling {short_impl_name} failed.")
-                break
-
         except Exception as e:
             app.logger.warn(f"Circuit analysis unexpectedly failed for {short_impl_name}: {str(e)}")
             abort(500)
@@ -113,176 +127,101 @@ def analyze_original_circuit():
 
 
 @app.route('/pytket-service/api/v1.0/transpile', methods=['POST'])
-def transpile_circuit():
-    """Get implementation from URL. Pass input into implementation. Generate and transpile circuit
-    and return depth and width."""
-
-    if not request.json or not 'qpu-name' in request.json or not 'provider' in request.json or not 'impl-language' in request.json:
-        abort(400)
-
-    provider = request.json["provider"]
-    impl_language = request.json["impl-language"]
-    qpu_name = request.json['qpu-name']
-    input_params = request.json.get('input-params', "")
+@requires_json(transpile_fields)
+def transpile_circuit(body):
+    """Put transpilation job in queue. Return location of the later result.
+    With the query parameter sync=true, transpile the circuit directly and return its properties."""
+
+    provider = body["provider"]
+    impl_language = body["impl-language"]
+    qpu_name = body['qpu-name']
+    input_params = body.get('input-params', {})
     input_params = parameters.ParameterDictionary(input_params)
 
-    # setup the SDK credentials first
-    setup_credentials(provider, **input_params)
-    circuit = None
-    short_impl_name = ""
-
-    impl_url = request.json['impl-url'] if 'impl-url' in request.json else None
+    impl_url = body.get('impl-url')
     impl_data = base64.standard_b64decode(
-        request.json['impl-data'].encode()).decode() if 'impl-data' in request.json else None
+        body['impl-data'].encode()).decode() if 'impl-data' in body else None
+    bearer_token = body.get("bearer-token", "")
 
-    bearer_token = request.json.get("bearer-token", "")
+    if request.args.get('sync', 'false').lower() == 'true':
+        response, status_code = transpile_handler.transpile(impl_url, impl_data, impl_language, input_params,
+                                                            provider, qpu_name, bearer_token)
+        return jsonify(response), status_code
 
-    try:
-        circuit, short_impl_name = implementation_handler.prepare_code(impl_url, impl_data, impl_language, input_params,
-                                                                       bearer_token)
-    except ValueError:
-        abort(400)
-    except Exception as e:
-        app.logger.info(f"Transpile {short_impl_name} for {qpu_name}: {str(e)}")
-        return jsonify({'error': str(e)}), 400
-
-    if not circuit:
-        app.logger.info(f"Transpile {short_impl_name} for {qpu_name}: Failed to create circuit.")
-        return jsonify({'error': "Failed to create circuit."}), 400
-
-    # Identify the backend given provider and qpu name
-    backend = get_backend(provider, qpu_name)
-
-    if not backend:
-        app.logger.warn(f"{qpu_name} not found.")
-        abort(404)
-
-    non_transpiled_width = None
-    non_transpiled_depth = None
-    non_transpiled_multi_qubit_gate_depth = None
-    non_transpiled_total_number_of_operations = None
-    non_transpiled_number_of_multi_qubit_gates = None
-    non_transpiled_number_of_measurement_operations = None
-    non_transpiled_number_of_single_qubit_gates = None
+    # commit the result entry before enqueueing the job, so the worker always finds it
+    job_id = str(uuid.uuid4())
+    result = Result(id=job_id, backend=qpu_name)
+    db.session.add(result)
+    db.session.commit()
 
-    precompiled_circuit = False
-    while not is_tk_circuit(circuit) or not backend.valid_circuit(circuit):
+    app.execute_queue.enqueue('app.tasks.transpile', job_id=job_id, impl_url=impl_url, impl_data=impl_data,
+                              impl_language=impl_language, input_params=input_params, provider=provider,
+                              qpu_name=qpu_name, bearer_token=bearer_token)
 
-        try:
-            circuit, \
-            non_transpiled_width, \
-            non_transpiled_depth, \
-            non_transpiled_multi_qubit_gate_depth, \
-            non_transpiled_total_number_of_operations, \
-            non_transpiled_number_of_multi_qubit_gates, \
-            non_transpiled_number_of_measurement_operations, \
-            non_transpiled_number_of_single_qubit_gates \
-                = tket_transpile_circuit(circuit,
-                                         impl_language=impl_language,
-                                         backend=backend,
-                                         short_impl_name=short_impl_name,
-                                         logger=app.logger.info,
-                                         precompile_circuit=precompiled_circuit)
+    return _result_location_response(job_id)
 
-        except UnsupportedGateException as e:
 
-            # unsupported gate type caused circuit conversion to fail
-            app.logger.warn(f"Unsupported gate ({e.gate}) in implementation {short_impl_name}.")
+@app.route('/pytket-service/api/v1.0/transpile-batch', methods=['POST'])
+@requires_json(batch_fields)
+def transpile_circuit_batch(body):
+    """Transpile the circuits of multiple implementations in parallel. Return the properties of
+    each transpiled circuit in the order of the request."""
 
-            # precompile the circuit and retry
-            if not precompiled_circuit:
-                precompiled_circuit = True
-                continue
-            else:
-                app.logger.warn(f"Precompiling {short_impl_name} failed.")
-                break
+    if not isinstance(body['items'], list):
+        abort(400)
 
-        except TooManyQubitsException:
-            # Too many qubits required for the provided backend
-            app.logger.info(f"Transpile {short_impl_name} for {qpu_name}: too many qubits required")
-            return jsonify({'error': 'too many qubits required'}), 200
+    items = []
+    for item in body['items']:
+        if not isinstance(item, dict) or not transpile_fields <= item.keys():
+            abort(400)
 
-        except Exception as e:
-            app.logger.warn(f"Circuit compilation unexpectedly failed for {short_impl_name}: {str(e)}")
-            abort(500)
+        items.append({'impl_url': item.get('impl-url'),
+                      'impl_data': base64.standard_b64decode(
+                          item['impl-data'].encode()).decode() if 'impl-data' in item else None,
+                      'impl_language': item['impl-language'],
+                      'input_params': parameters.ParameterDictionary(item.get('input-params', {})),
+                      'provider': item['provider'],
+                      'qpu_name': item['qpu-name'],
+                      'bearer_token': item.get('bearer-token', "")})
 
-    # After compilation the circuit should be valid
-    if not backend.valid_circuit(circuit):
-        app.logger.warn(f"Circuit compilation unexpectedly failed for {short_impl_name}.")
-        abort(500)
-
-    response = prepare_transpile_response(circuit, provider)
-
-    # get statistics about the compiled circuit
-    width = circuit.n_qubits
-    depth = get_depth_without_barrier(circuit)
-    multi_qubit_gate_depth = get_multi_qubit_gate_depth(circuit)
-    total_number_of_operations = circuit.n_gates
-    number_of_multi_qubit_gates = get_number_of_multi_qubit_gates(circuit)
-    number_of_measurement_operations = get_number_of_measurement_operations(circuit)
-    number_of_single_qubit_gates = total_number_of_operations - number_of_multi_qubit_gates \
-                                   - number_of_measurement_operations
-
-    response['original-width'] = non_transpiled_width
-    response['original-depth'] = non_transpiled_depth
-    response['original-multi-qubit-gate-depth'] = non_transpiled_multi_qubit_gate_depth
-    response['original-total-number-of-operations'] = non_transpiled_total_number_of_operations
-    response['original-number-of-single-qubit-gates'] = non_transpiled_number_of_single_qubit_gates
-    response['original-number-of-multi-qubit-gates'] = non_transpiled_number_of_multi_qubit_gates
-    response['original-number-of-measurement-operations'] = non_transpiled_number_of_measurement_operations
-    response['width'] = width
-    response['depth'] = depth
-    response['multi-qubit-gate-depth'] = multi_qubit_gate_depth
-    response['total-number-of-operations'] = total_number_of_operations
-    response['number-of-single-qubit-gates'] = number_of_single_qubit_gates
-    response['number-of-multi-qubit-gates'] = number_of_multi_qubit_gates
-    response['number-of-measurement-operations'] = number_of_measurement_operations
-
-    app.logger.info(f"Transpiled {short_impl_name} for {qpu_name}: "
-                    f"w={width}, "
-                    f"d={depth}, "
-                    f"mutli qubit gate depth={multi_qubit_gate_depth}"
-                    f"total number of operations={total_number_of_operations}, "
-                    f"number of single qubit gates={number_of_single_qubit_gates}, "
-                    f"number of multi qubit gates={number_of_multi_qubit_gates}, "
-                    f"number of measurement operations={number_of_measurement_operations}")
-    return jsonify(response), 200
+    return jsonify(transpile_handler.transpile_batch(items)), 200
 
 
 @app.route('/pytket-service/api/v1.0/execute', methods=['POST'])
-def execute_circuit():
+@requires_json(execute_fields)
+def execute_circuit(body):
     """Put execution job in queue. Return location of the later result."""
-    if not request.json or not 'qpu-name' in request.json or not 'provider' in request.json:
-        abort(400)
+    provider = body["provider"]
+    qpu_name = body['qpu-name']
 
-    provider = request.json["provider"]
-    qpu_name = request.json['qpu-name']
+    impl_url = body.get('impl-url')
+    bearer_token = body.get("bearer-token", "")
+    impl_language = body.get("impl-language")
+    impl_data = body.get('impl-data')
+    transpiled_qasm = body.get('transpiled-qasm')
+    transpiled_quil = body.get('transpiled-quil')
 
-    impl_url = request.json.get('impl-url')
-    bearer_token = request.json.get("bearer-token", "")
-    impl_language = request.json.get("impl-language")
-    impl_data = request.json.get('impl-data')
-    transpiled_qasm = request.json.get('transpiled-qasm')
-    transpiled_quil = request.json.get('transpiled-quil')
-
-    input_params = request.json.get('input-params', "")
+    input_params = body.get('input-params', {})
     input_params = parameters.ParameterDictionary(input_params)
-    shots = request.json.get('shots', 1024)
-
-    job = app.execute_queue.enqueue('app.tasks.execute', impl_url=impl_url, impl_data=impl_data,
-                                    transpiled_qasm=transpiled_qasm,
-                                    transpiled_quil=transpiled_quil, qpu_name=qpu_name,
-                                    input_params=input_params, shots=shots, provider=provider,
-                                    impl_language=impl_language, bearer_token=bearer_token)
-    result = Result(id=job.get_id(), backend=qpu_name, shots=shots)
-    db.session.add(result)
-    db.session.commit()
+    shots = body.get('shots', 1024)
+
+    # the result entry is committed with the next batch, the job is enqueued afterwards so it always finds its entry
+    job_id = str(uuid.uuid4())
+    result_batcher.add({'id': job_id, 'backend': qpu_name, 'shots': shots, 'complete': False},
+                       lambda: app.execute_queue.enqueue('app.tasks.execute', job_id=job_id, impl_url=impl_url,
+                                                         impl_data=impl_data, transpiled_qasm=transpiled_qasm,
+                                                         transpiled_quil=transpiled_quil, qpu_name=qpu_name,
+                                                         input_params=input_params, shots=shots, provider=provider,
+                                                         impl_language=impl_language, bearer_token=bearer_token))
 
     logging.info('Returning HTTP response to client...')
-    content_location = '/pytket-service/api/v1.0/results/' + result.id
-    response = jsonify({'Location': content_location})
-    response.status_code = 202
-    response.headers['Location'] = content_location
+    return _result_location_response(job_id)
+
+
+def _result_location_response(result_id):
+    """Return the location of the later result, result ids are UUIDs and need no JSON escaping."""
+    response = Response(result_location_body % result_id, status=202, mimetype='application/json')
+    response.headers['Location'] = result_location % result_id
     response.autocorrect_location_header = True
     return response
 
@@ -290,15 +229,80 @@ def execute_circuit():
 @app.route('/pytket-service/api/v1.0/results/<result_id>', methods=['GET'])
 def get_result(result_id):
     """Return result when it is available."""
+    cached_body = cache.get('result:' + result_id)
+    if cached_body:
+        return Response(cached_body, status=200, mimetype='application/json')
+
+    state = result_batcher.get_state(result_id)
+    if state == PENDING:
+        return jsonify({'id': result_id, 'complete': False}), 200
+
     result = Result.query.get(result_id)
+    if result is None:
+        if state:
+            # the result entry could not be stored
+            return Response(_get_failed_result_body(result_id, state), status=200, mimetype='application/json')
+        abort(404)
+
     if result.complete:
-        result_dict = json.loads(result.result)
-        return jsonify({'id': result.id, 'complete': result.complete, 'result': result_dict,
-                        'backend': result.backend, 'shots': result.shots}), 200
+        body = _get_complete_result_body(result)
+        # completed results do not change anymore, incomplete ones have to be queried on every poll
+        cache.set('result:' + result_id, body)
+        return Response(body, status=200, mimetype='application/json')
     else:
         return jsonify({'id': result.id, 'complete': result.complete}), 200
 
 
+@app.route('/pytket-service/api/v1.0/results/<result_id>/stream', methods=['GET'])
+def stream_result(result_id):
+    """Send the result as server-sent event as soon as it is available."""
+    if result_batcher.get_state(result_id) is None and Result.query.get(result_id) is None:
+        abort(404)
+
+    def generate():
+        pubsub = app.redis.pubsub(ignore_subscribe_messages=True)
+        # subscribe before checking the result, so a completion in between is not missed
+        pubsub.subscribe(get_result_channel(result_id))
+        deadline = time.monotonic() + app.config['RESULT_STREAM_TIMEOUT']
+        try:
+            while True:
+                result = Result.query.get(result_id)
+                if result and result.complete:
+                    yield b'data: ' + _get_complete_result_body(result) + b'\n\n'
+                    return
+                if result is None:
+                    state = result_batcher.get_state(result_id)
+                    if state not in (None, PENDING):
+                        yield b'data: ' + _get_failed_result_body(result_id, state) + b'\n\n'
+                        return
+
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    return
+
+                # end the transaction instead of holding it open while waiting, the result is reloaded afterwards
+                db.session.rollback()
+                # wait for the worker to publish the completion, send a comment to keep the connection alive
+                if not pubsub.get_message(timeout=min(timeout, app.config['RESULT_STREAM_HEARTBEAT'])):
+                    yield b': keep-alive\n\n'
+        finally:
+            pubsub.close()
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream')
+
+
+def _get_complete_result_body(result):
+    # embed the stored JSON as it is instead of parsing and serializing it again
+    return b'{"id":' + orjson.dumps(result.id) \
+           + b',"complete":true,"result":' + decompress_result(result.result) \
+           + b',"backend":' + orjson.dumps(result.backend) \
+           + b',"shots":' + orjson.dumps(result.shots) + b'}'
+
+
+def _get_failed_result_body(result_id, error):
+    return orjson.dumps({'id': result_id, 'complete': True, 'result': {'error': error}})
+
+
 @app.route('/pytket-service/api/v1.0/version', methods=['GET'])
 def version():
     return jsonify({'version': '1.0'})
@@ -17,11 +17,12 @@
 #  limitations under the License.
 # ******************************************************************************
 
-from app import implementation_handler, db
+from app import app, implementation_handler, transpile_handler, transpile_cache, db
 from rq import get_current_job
-from app.tket_handler import tket_transpile_circuit, UnsupportedGateException, get_backend, setup_credentials
-from app.result_model import Result
-import json
+from werkzeug.exceptions import HTTPException
+from app.tket_handler import tket_transpile_circuit, needs_precompile, get_backend, setup_credentials
+from app.result_model import Result, compress_result, get_result_channel
+from app.parameters import split_credential_parameters
 from pytket.qasm import circuit_to_qasm_str, circuit_from_qasm_str
 from pyquil import Program as PyQuilProgram
 from pytket.extensions.pyquil import pyquil_to_tk
@@ -29,7 +30,7 @@ from pytket.predicates import ConnectivityPredicate
 from pytket.passes import DefaultMappingPass
 
 
-def convert_counts_to_json(counts):
+def convert_counts_to_dict(counts):
     result = {}
     for bits, count in counts.items():
         # bitstring = np.binary_repr(bits)
@@ -37,7 +38,22 @@ def convert_counts_to_json(counts):
         # reverse the string to be uniform with IBM Quantum results
         result[bitstring[::-1]] = int(count)
 
-    return json.dumps(result)
+    return result
+
+
+def _store_result(result_id, result):
+    """Save the result in db and notify clients waiting for it"""
+    entry = Result.query.get(result_id)
+    if entry is None:
+        # the entry was not committed, store the result anyway so it does not get lost
+        app.logger.warn(f"No result entry for job {result_id}, creating it.")
+        entry = Result(id=result_id)
+        db.session.add(entry)
+
+    entry.result = compress_result(result)
+    entry.complete = True
+    db.session.commit()
+    app.redis.publish(get_result_channel(result_id), 1)
 
 
 def rename_qreg_lowercase(circuit, *regs):
@@ -62,42 +78,42 @@ def execute(impl_url, impl_data, transpiled_qasm, transpiled_quil, input_params,
     job = get_current_job()
 
     # setup the SDK credentials first
-    setup_credentials(provider, **input_params)
+    credential_params, compile_params = split_credential_parameters(input_params)
+    setup_credentials(provider, **credential_params)
     # Get the backend
-    backend = get_backend(provider, qpu_name)
+    backend = get_backend(provider, qpu_name, credential_params.get('token'))
 
     if not transpiled_qasm and not transpiled_quil:
 
-        circuit, short_impl_name = implementation_handler.prepare_code(impl_url, impl_data, impl_language, input_params, bearer_token)
-
-        # Transpile the circuit for the backend
-        try:
-            circuit = tket_transpile_circuit(circuit,
-                                             impl_language=impl_language,
-                                             backend=backend,
-                                             short_impl_name=short_impl_name,
-                                             logger=None, precompile_circuit=False)
-        except UnsupportedGateException:
-            circuit = tket_transpile_circuit(circuit,
-                                             impl_language=impl_language,
-                                             backend=backend,
-                                             short_impl_name=short_impl_name,
-                                             logger=None, precompile_circuit=True)
-        finally:
-            if not backend.valid_circuit(circuit):
-                result = Result.query.get(job.get_id())
-                result.result = json.dumps({'error': 'execution failed'})
-                result.complete = True
-                db.session.commit()
-                return
+        # reuse the circuit of a previous transpilation of the same code with the same bearer token,
+        # downloaded implementations are revalidated, so a changed implementation is transpiled again
+        circuit = None
+        impl_source = implementation_handler.get_source(impl_url, impl_data, bearer_token)
+        if impl_source is not None:
+            cache_key = transpile_cache.get_cache_key(impl_source, impl_language, compile_params, provider,
+                                                      qpu_name, bearer_token)
+            circuit = transpile_cache.get_cached_circuit(cache_key)
+
+        if circuit is None:
+            circuit, short_impl_name = implementation_handler.prepare_code(impl_url, impl_data, impl_language, input_params, bearer_token)
+
+            # Transpile the circuit for the backend
+            try:
+                circuit, *_ = tket_transpile_circuit(circuit,
+                                                     impl_language=impl_language,
+                                                     backend=backend,
+                                                     short_impl_name=short_impl_name,
+                                                     logger=None,
+                                                     precompile_circuit=needs_precompile(circuit, impl_language))
+            finally:
+                if not backend.valid_circuit(circuit):
+                    _store_result(job.get_id(), {'error': 'execution failed'})
+                    return
     elif transpiled_qasm:
         circuit = circuit_from_qasm_str(transpiled_qasm)
 
         if not backend.valid_circuit(circuit):
-            result = Result.query.get(job.get_id())
-            result.result = json.dumps({'error': "transpiled QASM doesn't meet QPU requirements"})
-            result.complete = True
-            db.session.commit()
+            _store_result(job.get_id(), {'error': "transpiled QASM doesn't meet QPU requirements"})
             return
     elif transpiled_quil:
         circuit = pyquil_to_tk(PyQuilProgram(transpiled_quil))
@@ -109,10 +125,7 @@ def execute(impl_url, impl_data, transpiled_qasm, transpiled_quil, input_params,
             DefaultMappingPass(backend.backend_info.architecture).apply(circuit)
 
         if not backend.valid_circuit(circuit):
-            result = Result.query.get(job.get_id())
-            result.result = json.dumps({'error': "transpiled Quil doesn't meet QPU requirements"})
-            result.complete = True
-            db.session.commit()
+            _store_result(job.get_id(), {'error': "transpiled Quil doesn't meet QPU requirements"})
             return
 
     # Rename registers to lower case
@@ -125,9 +138,23 @@ def execute(impl_url, impl_data, transpiled_qasm, transpiled_quil, input_params,
     job_status = backend.circuit_status(job_handle)
     job_result = backend.get_result(job_handle)
 
-    result = Result.query.get(job.get_id())
     counts = job_result.get_counts()
     print(counts)
-    result.result = convert_counts_to_json(counts)
-    result.complete = True
-    db.session.commit()
+    _store_result(job.get_id(), convert_counts_to_dict(counts))
+
+
+def transpile(impl_url, impl_data, impl_language, input_params, provider, qpu_name, bearer_token: str = ""):
+    """Get implementation code, prepare it, and transpile it for the QPU. Save the circuit properties in db"""
+    job = get_current_job()
+
+    try:
+        response, _ = transpile_handler.transpile(impl_url, impl_data, impl_language, input_params, provider,
+                                                  qpu_name, bearer_token)
+    except HTTPException as e:
+        response = {'error': e.name}
+    except Exception as e:
+        # e.g. invalid credentials or an unknown QPU, the result has to complete anyway
+        app.logger.warn(f"Transpile job {job.get_id()} failed: {str(e)}")
+        response = {'error': str(e)}
+
+    _store_result(job.get_id(), response)
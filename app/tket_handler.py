@@ -19,6 +19,11 @@
 
 import re
 import os
+import time
+import hashlib
+import threading
+import weakref
+from functools import lru_cache
 
 from pytket.extensions.qiskit import qiskit_to_tk
 from pytket.extensions.pyquil import pyquil_to_tk, tk_to_pyquil
@@ -32,13 +37,31 @@ from flask import abort
 
 from qiskit.compiler import transpile
 from qiskit import IBMQ
+from qiskit.circuit import ControlledGate
+from qiskit.extensions import UnitaryGate
 import qiskit.circuit.library as qiskit_gates
 
+try:
+    # gates the qiskit conversion supports, private to pytket and may change between versions
+    from pytket.extensions.qiskit.qiskit_convert import _known_qiskit_gate
+except ImportError:
+    _known_qiskit_gate = None
+
 # Get environment variables
 qvm_hostname = os.environ.get('QVM_HOSTNAME', default='localhost')
 qvm_port = os.environ.get('QVM_PORT', default=5016)
 quilc_hostname = os.environ.get("QUILC_HOSTNAME", default="localhost")
 quilc_port = os.environ.get("QUILC_PORT", default=5017)
+backend_cache_ttl = int(os.environ.get("BACKEND_CACHE_TTL", default=60 * 60))
+
+# the IBMQ account is set per process
+_ibmq_account_lock = threading.Lock()
+
+# default compilation passes by backend, released together with the backend
+_compilation_passes = weakref.WeakKeyDictionary()
+
+# error raised by tket if the circuit requires more qubits than the backend provides
+max_n_qubits_error = re.compile(".* MaxNQubitsPredicate\\([0-9]+\\)")
 
 
 def prepare_transpile_response(circuit, provider):
@@ -65,12 +88,24 @@ def get_depth_without_barrier(circuit):
 def setup_credentials(provider, **kwargs):
     if provider.lower() == "ibmq":
         if 'token' in kwargs:
-            IBMQ.save_account(token=kwargs['token'], overwrite=True)
-            IBMQ.load_account()
+            _load_ibmq_account(kwargs['token'])
         else:
             abort(400)
 
 
+def _load_ibmq_account(token):
+    with _ibmq_account_lock:
+        # only one IBMQ account is active per process, skip the handshake if it belongs to the same token
+        active_account = IBMQ.active_account()
+        if active_account and active_account.get('token') == token:
+            return
+
+        # keep the account in memory, saving it would share it with all processes through the qiskitrc file
+        if active_account:
+            IBMQ.disable_account()
+        IBMQ.enable_account(token)
+
+
 def get_circuit_conversion_for(impl_language):
     """
     Get the circuit conversion function by name.
@@ -96,21 +131,51 @@ def get_circuit_conversion_for(impl_language):
     return None
 
 
-def get_backend(provider, qpu):
+def hash_token(token):
+    """
+    Get a short hash identifying the token without keeping the token itself
+    :param token:
+    :return:
+    """
+
+    if not token:
+        return None
+
+    return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+
+class _BackendNotFound(Exception):
+    pass
+
+
+def get_backend(provider, qpu, token=None):
     """
-    Get the backend instance by name
+    Get the backend instance by name.
+    Backends are reused for the same token until the backend cache TTL expires.
     :param provider:
     :param qpu:
+    :param token: the token the backend is accessed with
     :return:
     """
 
-    if provider.lower() == "ibmq":
+    try:
+        return _get_cached_backend(provider.lower(), qpu, hash_token(token), int(time.monotonic() // backend_cache_ttl))
+    except _BackendNotFound:
+        return None
+
+
+@lru_cache(maxsize=32)
+def _get_cached_backend(provider, qpu, token_hash, ttl_period):
+    # token_hash and ttl_period are only part of the cache key
+    # missing backends are raised instead of returned, so they are not cached
+
+    if provider == "ibmq":
         try:
             return IBMQBackend(qpu)
         except NoIBMQAccountError:
-            return None
+            raise _BackendNotFound()
 
-    if provider.lower() == "rigetti":
+    if provider == "rigetti":
         # Create a connection to the forest SDK
         connection = ForestConnection(
             sync_endpoint=f"http://{qvm_hostname}:{qvm_port}",
@@ -119,7 +184,50 @@ def get_backend(provider, qpu):
         return ForestBackend(qpu, simulator=True, connection=connection)
 
     # Default if no provider matched
-    return None
+    raise _BackendNotFound()
+
+
+def get_compilation_pass(backend):
+    """
+    Get the default compilation pass of the backend with optimisation level 2.
+    The pass is built once per backend instance, applying it runs entirely in tket.
+    :param backend:
+    :return:
+    """
+
+    compilation_pass = _compilation_passes.get(backend)
+    if compilation_pass is None:
+        compilation_pass = backend.default_compilation_pass(2)
+        _compilation_passes[backend] = compilation_pass
+    return compilation_pass
+
+
+def warm_backends(backends, logger=None):
+    """
+    Create the given backends and their compilation passes before the first request needs them.
+    IBMQ backends are created for the account stored in the qiskitrc file, they are skipped without one.
+    :param backends: list of (provider, qpu) tuples
+    :param logger:
+    :return:
+    """
+
+    for provider, qpu in backends:
+        try:
+            token = None
+            if provider.lower() == "ibmq":
+                token = IBMQ.stored_account().get('token')
+                if not token:
+                    if logger:
+                        logger(f"Skipping {qpu}: no stored IBMQ account.")
+                    continue
+                setup_credentials(provider, token=token)
+
+            backend = get_backend(provider, qpu, token)
+            if backend:
+                get_compilation_pass(backend)
+        except Exception as e:
+            if logger:
+                logger(f"Creating backend {qpu} failed: {str(e)}")
 
 
 def is_tk_circuit(circuit):
@@ -140,6 +248,35 @@ def pretranspile_circuit(circuit, impl_language):
         return circuit
 
 
+# Non-unitary operations are always supported by the qiskit conversion
+_qiskit_non_gate_operations = frozenset({'measure', 'barrier', 'reset'})
+
+
+def _is_unsupported_qiskit_instruction(instruction):
+    # the conversion handles generic controlled gates and unitaries before looking up the gate type,
+    # they are only precompiled if the conversion fails, see convert_to_tk_circuit
+    if type(instruction) is ControlledGate or isinstance(instruction, UnitaryGate):
+        return False
+
+    return type(instruction) not in _known_qiskit_gate and instruction.name not in _qiskit_non_gate_operations
+
+
+def needs_precompile(circuit, impl_language):
+    """
+    Checks whether the circuit contains gates that certainly cannot be converted to tket without precompiling it.
+    Only Qiskit circuits are precompiled, see pretranspile_circuit.
+    :param circuit:
+    :param impl_language:
+    :return:
+    """
+
+    # without the supported gates only failing conversions are precompiled
+    if not impl_language or impl_language.lower() != "qiskit" or _known_qiskit_gate is None:
+        return False
+
+    return any(_is_unsupported_qiskit_instruction(instruction) for instruction, _, _ in circuit.data)
+
+
 def pretranspile_qiskit_circuit(circuit):
     """
     Pre-transpiles the qiskit circuit to a set of gates that are supported by the Tket compiler.
@@ -190,29 +327,48 @@ class TooManyQubitsException(Exception):
     pass
 
 
-def tket_analyze_original_circuit(circuit, impl_language, short_impl_name, logger=None, precompile_circuit=False):
+def convert_to_tk_circuit(circuit, impl_language, short_impl_name, logger=None, precompile_circuit=False):
+    """
+    Converts the circuit to a tket circuit, precompiling it first if requested.
+    If the conversion of a circuit that was not precompiled fails, it is precompiled and converted once more.
+    :param circuit:
+    :param impl_language:
+    :param short_impl_name:
+    :param logger:
+    :param precompile_circuit:
+    :return:
+    """
+
     if precompile_circuit:
         if logger:
             logger(f"Precompiling {short_impl_name} using {impl_language} standard compiler...")
         circuit = pretranspile_circuit(circuit, impl_language)
     try:
-        # Convert the given Circuit (implemented with impl_language) to a standard TKet circuit
         to_tk = get_circuit_conversion_for(impl_language)
-        circuit = to_tk(circuit)
-
-        non_transpiled_width = circuit.n_qubits
-        non_transpiled_depth = get_depth_without_barrier(circuit)
-        non_transpiled_multi_qubit_gate_depth = get_multi_qubit_gate_depth(circuit)
-        non_transpiled_total_number_of_operations = circuit.n_gates
-        non_transpiled_number_of_multi_qubit_gates = get_number_of_multi_qubit_gates(circuit)
-        non_transpiled_number_of_measurement_operations = get_number_of_measurement_operations(circuit)
-        non_transpiled_number_of_single_qubit_gates = non_transpiled_total_number_of_operations \
-                                                      - non_transpiled_number_of_multi_qubit_gates \
-                                                      - non_transpiled_number_of_measurement_operations
-
+        return to_tk(circuit)
     except KeyError as e:
-        # unsupported gate type caused circuit conversion to fail
-        raise UnsupportedGateException(str(e))
+        if precompile_circuit:
+            # unsupported gate type caused circuit conversion to fail
+            raise UnsupportedGateException(str(e))
+        if logger:
+            logger(f"Unsupported gate ({str(e)}) in implementation {short_impl_name}, retrying precompiled.")
+
+    return convert_to_tk_circuit(circuit, impl_language, short_impl_name, logger, precompile_circuit=True)
+
+
+def tket_analyze_original_circuit(circuit, impl_language, short_impl_name, logger=None, precompile_circuit=False):
+    # Convert the given Circuit (implemented with impl_language) to a standard TKet circuit
+    circuit = convert_to_tk_circuit(circuit, impl_language, short_impl_name, logger, precompile_circuit)
+
+    non_transpiled_width = circuit.n_qubits
+    non_transpiled_depth = get_depth_without_barrier(circuit)
+    non_transpiled_multi_qubit_gate_depth = get_multi_qubit_gate_depth(circuit)
+    non_transpiled_total_number_of_operations = circuit.n_gates
+    non_transpiled_number_of_multi_qubit_gates = get_number_of_multi_qubit_gates(circuit)
+    non_transpiled_number_of_measurement_operations = get_number_of_measurement_operations(circuit)
+    non_transpiled_number_of_single_qubit_gates = non_transpiled_total_number_of_operations \
+                                                  - non_transpiled_number_of_multi_qubit_gates \
+                                                  - non_transpiled_number_of_measurement_operations
 
     return circuit, \
            non_transpiled_width, \
@@ -224,34 +380,24 @@ def tket_analyze_original_circuit(circuit, impl_language, short_impl_name, logge
            non_transpiled_number_of_single_qubit_gates
 
 def tket_transpile_circuit(circuit, impl_language, backend, short_impl_name, logger=None, precompile_circuit=False):
-    if precompile_circuit:
-        if logger:
-            logger(f"Precompiling {short_impl_name} using {impl_language} standard compiler...")
-        circuit = pretranspile_circuit(circuit, impl_language)
-    try:
-        # Convert the given Circuit (implemented with impl_language) to a standard TKet circuit
-        to_tk = get_circuit_conversion_for(impl_language)
-        circuit = to_tk(circuit)
-
-        non_transpiled_width = circuit.n_qubits
-        non_transpiled_depth = get_depth_without_barrier(circuit)
-        non_transpiled_multi_qubit_gate_depth = get_multi_qubit_gate_depth(circuit)
-        non_transpiled_total_number_of_operations = circuit.n_gates
-        non_transpiled_number_of_multi_qubit_gates = get_number_of_multi_qubit_gates(circuit)
-        non_transpiled_number_of_measurement_operations = get_number_of_measurement_operations(circuit)
-        non_transpiled_number_of_single_qubit_gates = non_transpiled_total_number_of_operations \
-                                                      - non_transpiled_number_of_multi_qubit_gates \
-                                                      - non_transpiled_number_of_measurement_operations
-
-    except KeyError as e:
-        # unsupported gate type caused circuit conversion to fail
-        raise UnsupportedGateException(str(e))
+    # Convert the given Circuit (implemented with impl_language) to a standard TKet circuit
+    circuit = convert_to_tk_circuit(circuit, impl_language, short_impl_name, logger, precompile_circuit)
+
+    non_transpiled_width = circuit.n_qubits
+    non_transpiled_depth = get_depth_without_barrier(circuit)
+    non_transpiled_multi_qubit_gate_depth = get_multi_qubit_gate_depth(circuit)
+    non_transpiled_total_number_of_operations = circuit.n_gates
+    non_transpiled_number_of_multi_qubit_gates = get_number_of_multi_qubit_gates(circuit)
+    non_transpiled_number_of_measurement_operations = get_number_of_measurement_operations(circuit)
+    non_transpiled_number_of_single_qubit_gates = non_transpiled_total_number_of_operations \
+                                                  - non_transpiled_number_of_multi_qubit_gates \
+                                                  - non_transpiled_number_of_measurement_operations
 
     try:
         # Use tket to compile the circuit
-        backend.compile_circuit(circuit, optimisation_level=2)
+        get_compilation_pass(backend).apply(circuit)
     except RuntimeError as e:
-        if re.match(".* MaxNQubitsPredicate\\([0-9]+\\)", str(e)):
+        if max_n_qubits_error.match(str(e)):
             raise TooManyQubitsException()
         else:
             raise e
@@ -0,0 +1,115 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import hashlib
+import json
+
+import orjson
+import pkg_resources
+from pytket import Circuit as TKCircuit
+from redis.exceptions import RedisError
+
+from app import app
+
+# compilation results may change between tket releases
+pytket_version = pkg_resources.get_distribution("pytket").version
+
+
+def get_cache_key(impl_source, impl_language, input_params, provider, qpu_name, bearer_token: str = ""):
+    """
+    Get the key identifying a transpilation request in the cache.
+    :param impl_source: the code of the implementation, downloaded ones change behind their URL
+    :param impl_language: the language of the implementation
+    :param input_params: the typed input parameters of the implementation, without credentials
+    :param provider: the provider of the QPU
+    :param qpu_name: the name of the QPU
+    :param bearer_token: the token used to download the implementation
+    :return: SHA-256 hex digest over all inputs affecting the transpilation
+    """
+
+    # implementations downloaded with a bearer token may only be accessible with that token,
+    # so cached results are never shared between different bearer tokens
+    key = json.dumps([hashlib.sha256(impl_source.encode()).hexdigest(),
+                      hashlib.sha256(bearer_token.encode()).hexdigest(),
+                      sorted((k, str(v)) for k, v in input_params.items()),
+                      provider.lower(),
+                      qpu_name,
+                      (impl_language or "").lower(),
+                      pytket_version])
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_cached_response(key):
+    """
+    Get the cached transpile response for the given key.
+    :param key:
+    :return: the response dict or None on a cache miss
+    """
+
+    try:
+        cached = app.redis.get(f"transpile:{key}")
+    except RedisError as e:
+        app.logger.warn(f"Transpile cache unavailable: {str(e)}")
+        return None
+
+    return orjson.loads(cached) if cached else None
+
+
+def cache_response(key, response):
+    """
+    Store the transpile response for the given key.
+    :param key:
+    :param response:
+    :return:
+    """
+
+    try:
+        app.redis.set(f"transpile:{key}", orjson.dumps(response), ex=app.config['TRANSPILE_CACHE_TTL'])
+    except RedisError as e:
+        app.logger.warn(f"Transpile cache unavailable: {str(e)}")
+
+
+def get_cached_circuit(key):
+    """
+    Get the cached transpiled circuit for the given key.
+    :param key:
+    :return: the tket circuit or None on a cache miss
+    """
+
+    try:
+        cached = app.redis.get(f"circuit:{key}")
+    except RedisError as e:
+        app.logger.warn(f"Transpile cache unavailable: {str(e)}")
+        return None
+
+    return TKCircuit.from_dict(orjson.loads(cached)) if cached else None
+
+
+def cache_circuit(key, circuit):
+    """
+    Store the transpiled circuit for the given key.
+    :param key:
+    :param circuit:
+    :return:
+    """
+
+    try:
+        app.redis.set(f"circuit:{key}", orjson.dumps(circuit.to_dict()), ex=app.config['TRANSPILE_CACHE_TTL'])
+    except RedisError as e:
+        app.logger.warn(f"Transpile cache unavailable: {str(e)}")
@@ -0,0 +1,208 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+from app import app, implementation_handler, transpile_cache
+from app.parameters import split_credential_parameters
+from app.tket_handler import get_backend, is_tk_circuit, needs_precompile, setup_credentials, tket_transpile_circuit, \
+    UnsupportedGateException, TooManyQubitsException, get_depth_without_barrier, prepare_transpile_response, \
+    get_number_of_multi_qubit_gates, get_multi_qubit_gate_depth, get_number_of_measurement_operations
+
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from flask import abort
+from werkzeug.exceptions import HTTPException
+
+# created on first use, so gunicorn workers do not share the pool of the master process
+_batch_executor = None
+
+
+def transpile(impl_url, impl_data, impl_language, input_params, provider, qpu_name, bearer_token: str = ""):
+    """
+    Get the implementation, pass the input into it, generate and transpile the circuit for the given QPU.
+    Shared by the synchronous transpile route and the transpile task of the RQ worker.
+    :return: tuple of the response dict and the HTTP status code, aborts on invalid requests
+    """
+
+    # setup the SDK credentials first
+    credential_params, compile_params = split_credential_parameters(input_params)
+    setup_credentials(provider, **credential_params)
+    circuit = None
+    short_impl_name = ""
+
+    # skip compilation if the same implementation was already transpiled, the key is based on the current code,
+    # so changes behind the URL are picked up, credentials do not affect the result and are not part of the key
+    cache_key = None
+    impl_source = implementation_handler.get_source(impl_url, impl_data, bearer_token)
+    if impl_source is not None:
+        cache_key = transpile_cache.get_cache_key(impl_source, impl_language, compile_params, provider, qpu_name,
+                                                  bearer_token)
+        cached_response = transpile_cache.get_cached_response(cache_key)
+        if cached_response:
+            app.logger.info(f"Transpile for {qpu_name}: returning cached result {cache_key}")
+            return cached_response, 200
+
+    try:
+        circuit, short_impl_name = implementation_handler.prepare_code(impl_url, impl_data, impl_language, input_params,
+                                                                       bearer_token)
+    except ValueError:
+        abort(400)
+    except Exception as e:
+        app.logger.info(f"Transpile {short_impl_name} for {qpu_name}: {str(e)}")
+        return {'error': str(e)}, 400
+
+    if not circuit:
+        app.logger.info(f"Transpile {short_impl_name} for {qpu_name}: Failed to create circuit.")
+        return {'error': "Failed to create circuit."}, 400
+
+    # Identify the backend given provider and qpu name
+    backend = get_backend(provider, qpu_name, credential_params.get('token'))
+
+    if not backend:
+        app.logger.warn(f"{qpu_name} not found.")
+        abort(404)
+
+    non_transpiled_width = None
+    non_transpiled_depth = None
+    non_transpiled_multi_qubit_gate_depth = None
+    non_transpiled_total_number_of_operations = None
+    non_transpiled_number_of_multi_qubit_gates = None
+    non_transpiled_number_of_measurement_operations = None
+    non_transpiled_number_of_single_qubit_gates = None
+
+    if not is_tk_circuit(circuit) or not backend.valid_circuit(circuit):
+
+        try:
+            circuit, \
+            non_transpiled_width, \
+            non_transpiled_depth, \
+            non_transpiled_multi_qubit_gate_depth, \
+            non_transpiled_total_number_of_operations, \
+            non_transpiled_number_of_multi_qubit_gates, \
+            non_transpiled_number_of_measurement_operations, \
+            non_transpiled_number_of_single_qubit_gates \
+                = tket_transpile_circuit(circuit,
+                                         impl_language=impl_language,
+                                         backend=backend,
+                                         short_impl_name=short_impl_name,
+                                         logger=app.logger.info,
+                                         precompile_circuit=needs_precompile(circuit, impl_language))
+
+        except UnsupportedGateException as e:
+            # unsupported gate type caused circuit conversion to fail
+            app.logger.warn(f"Unsupported gate ({e.gate}) in implementation {short_impl_name}.")
+            abort(500)
+
+        except TooManyQubitsException:
+            # Too many qubits required for the provided backend
+            app.logger.info(f"Transpile {short_impl_name} for {qpu_name}: too many qubits required")
+            return {'error': 'too many qubits required'}, 200
+
+        except Exception as e:
+            app.logger.warn(f"Circuit compilation unexpectedly failed for {short_impl_name}: {str(e)}")
+            abort(500)
+
+    # After compilation the circuit should be valid
+    if not backend.valid_circuit(circuit):
+        app.logger.warn(f"Circuit compilation unexpectedly failed for {short_impl_name}.")
+        abort(500)
+
+    response = prepare_transpile_response(circuit, provider)
+
+    # get statistics about the compiled circuit
+    width = circuit.n_qubits
+    depth = get_depth_without_barrier(circuit)
+    multi_qubit_gate_depth = get_multi_qubit_gate_depth(circuit)
+    total_number_of_operations = circuit.n_gates
+    number_of_multi_qubit_gates = get_number_of_multi_qubit_gates(circuit)
+    number_of_measurement_operations = get_number_of_measurement_operations(circuit)
+    number_of_single_qubit_gates = total_number_of_operations - number_of_multi_qubit_gates \
+                                   - number_of_measurement_operations
+
+    response['original-width'] = non_transpiled_width
+    response['original-depth'] = non_transpiled_depth
+    response['original-multi-qubit-gate-depth'] = non_transpiled_multi_qubit_gate_depth
+    response['original-total-number-of-operations'] = non_transpiled_total_number_of_operations
+    response['original-number-of-single-qubit-gates'] = non_transpiled_number_of_single_qubit_gates
+    response['original-number-of-multi-qubit-gates'] = non_transpiled_number_of_multi_qubit_gates
+    response['original-number-of-measurement-operations'] = non_transpiled_number_of_measurement_operations
+    response['width'] = width
+    response['depth'] = depth
+    response['multi-qubit-gate-depth'] = multi_qubit_gate_depth
+    response['total-number-of-operations'] = total_number_of_operations
+    response['number-of-single-qubit-gates'] = number_of_single_qubit_gates
+    response['number-of-multi-qubit-gates'] = number_of_multi_qubit_gates
+    response['number-of-measurement-operations'] = number_of_measurement_operations
+
+    app.logger.info(f"Transpiled {short_impl_name} for {qpu_name}: "
+                    f"w={width}, "
+                    f"d={depth}, "
+                    f"mutli qubit gate depth={multi_qubit_gate_depth}"
+                    f"total number of operations={total_number_of_operations}, "
+                    f"number of single qubit gates={number_of_single_qubit_gates}, "
+                    f"number of multi qubit gates={number_of_multi_qubit_gates}, "
+                    f"number of measurement operations={number_of_measurement_operations}")
+    if cache_key:
+        transpile_cache.cache_response(cache_key, response)
+        transpile_cache.cache_circuit(cache_key, circuit)
+    return response, 200
+
+
+def _get_batch_executor():
+    global _batch_executor
+    if _batch_executor is None:
+        # gunicorn workers run threads, e.g. the result batcher, forking them could copy locks held by those threads
+        _batch_executor = ProcessPoolExecutor(max_workers=app.config['TRANSPILE_BATCH_WORKERS'],
+                                              mp_context=multiprocessing.get_context('forkserver'))
+    return _batch_executor
+
+
+def _transpile_one(item):
+    """Transpile a single item of a batch request in a worker process and return its response."""
+    try:
+        response, _ = transpile(**item)
+    except HTTPException as e:
+        response = {'error': e.name}
+    except Exception as e:
+        # one failing item must not fail the whole batch
+        app.logger.warn(f"Transpile of batch item failed: {str(e)}")
+        response = {'error': str(e)}
+    return response
+
+
+def transpile_batch(items):
+    """
+    Transpile the items of a batch request in parallel worker processes.
+    Items with the same cache key are only transpiled once.
+    :param items: list of keyword arguments for transpile
+    :return: list of the responses in the order of the items
+    """
+
+    keys = []
+    futures = {}
+    for item in items:
+        _, compile_params = split_credential_parameters(item['input_params'])
+        # within one request the same URL refers to the same implementation, so it is not downloaded here
+        key = transpile_cache.get_cache_key(item['impl_url'] or item['impl_data'], item['impl_language'],
+                                            compile_params, item['provider'], item['qpu_name'],
+                                            item['bearer_token'])
+        if key not in futures:
+            futures[key] = _get_batch_executor().submit(_transpile_one, item)
+        keys.append(key)
+
+    return [futures[key].result() for key in keys]
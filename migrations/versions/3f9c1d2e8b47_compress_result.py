@@ -0,0 +1,43 @@
+"""compress result
+
+Revision ID: 3f9c1d2e8b47
+Revises: 6201b3fee644
+Create Date: 2021-11-20 14:12:31.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import zstandard
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c1d2e8b47'
+down_revision = '6201b3fee644'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+    results = connection.execute(sa.text("SELECT id, result FROM result")).fetchall()
+
+    with op.batch_alter_table('result') as batch_op:
+        batch_op.alter_column('result', existing_type=sa.String(length=1200), type_=sa.LargeBinary())
+
+    compressor = zstandard.ZstdCompressor()
+    for result_id, result in results:
+        connection.execute(sa.text("UPDATE result SET result = :result WHERE id = :id"),
+                           result=compressor.compress((result or "").encode()), id=result_id)
+
+
+def downgrade():
+    connection = op.get_bind()
+    results = connection.execute(sa.text("SELECT id, result FROM result")).fetchall()
+
+    with op.batch_alter_table('result') as batch_op:
+        batch_op.alter_column('result', existing_type=sa.LargeBinary(), type_=sa.String(length=1200))
+
+    decompressor = zstandard.ZstdDecompressor()
+    for result_id, result in results:
+        connection.execute(sa.text("UPDATE result SET result = :result WHERE id = :id"),
+                           result=decompressor.decompress(result).decode() if result else "", id=result_id)
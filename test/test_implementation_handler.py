@@ -0,0 +1,37 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import unittest
+from app.implementation_handler import _get_short_impl_name
+
+
+class ShortImplNameTestCase(unittest.TestCase):
+
+    def test_query_string(self):
+        self.assertEqual(_get_short_impl_name("https://host/a.py?token=x", ".py"), "a.py")
+
+    def test_fragment(self):
+        self.assertEqual(_get_short_impl_name("https://host/circuits/a.qasm#v2", ".qasm"), "a.qasm")
+
+    def test_wrong_extension(self):
+        self.assertEqual(_get_short_impl_name("https://host/a.py?token=x", ".qasm"), "undefined")
+
+
+if __name__ == "__main__":
+    unittest.main()
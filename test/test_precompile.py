@@ -0,0 +1,65 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import unittest
+from qiskit import QuantumCircuit
+from qiskit.circuit import Gate
+from qiskit.circuit.library import RYGate
+from app.tket_handler import needs_precompile
+
+
+class CustomGate(Gate):
+
+    def __init__(self):
+        super().__init__("custom", 1, [])
+
+    def _define(self):
+        definition = QuantumCircuit(1)
+        definition.h(0)
+        self.definition = definition
+
+
+class PrecompileTestCase(unittest.TestCase):
+
+    def test_known_gates(self):
+        circuit = QuantumCircuit(2, 2)
+        circuit.h(0)
+        circuit.cx(0, 1)
+        circuit.barrier()
+        circuit.measure([0, 1], [0, 1])
+
+        self.assertFalse(needs_precompile(circuit, "Qiskit"))
+
+    def test_gates_handled_by_conversion(self):
+        circuit = QuantumCircuit(3)
+        circuit.append(RYGate(0.5).control(2), [0, 1, 2])
+        circuit.unitary([[0, 1], [1, 0]], [0])
+
+        self.assertFalse(needs_precompile(circuit, "Qiskit"))
+
+    def test_custom_gate(self):
+        circuit = QuantumCircuit(1)
+        circuit.append(CustomGate(), [0])
+
+        self.assertTrue(needs_precompile(circuit, "Qiskit"))
+        self.assertFalse(needs_precompile(circuit, "OpenQASM"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -18,10 +18,38 @@
 # ******************************************************************************
 
 import unittest
+from unittest import mock
 import os
+import time
 from app.config import basedir
 from app import app, db
-from app.result_model import Result
+from app.db_batcher import result_batcher, PENDING, _get_state_key
+from app.result_model import Result, compress_result
+
+
+class FakeRedis(object):
+    """Keeps the result states in memory, so the tests do not need a Redis server."""
+
+    def __init__(self):
+        self.values = {}
+        self.expires = {}
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value.encode()
+        self.expires[key] = time.monotonic() + ex
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def ttl(self, key):
+        return int(self.expires[key] - time.monotonic())
+
+    def delete(self, key):
+        self.values.pop(key, None)
+        self.expires.pop(key, None)
+
+    def publish(self, channel, message):
+        return 0
 
 
 class ResultsTestCase(unittest.TestCase):
@@ -36,6 +64,11 @@ class ResultsTestCase(unittest.TestCase):
         self.client = app.test_client()
         db.create_all()
 
+        # the jobs are not executed, only their enqueueing is checked
+        self.patches = [mock.patch.object(app, 'redis', FakeRedis()), mock.patch.object(app, 'execute_queue')]
+        for patch in self.patches:
+            patch.start()
+
         self.create_dummy_results()
 
     @classmethod
@@ -47,15 +80,16 @@ class ResultsTestCase(unittest.TestCase):
         db.session.commit()
 
         # Create complete dummy result
-        r = Result(id="1", complete=True, result="""
-        {
-            "text" : "I am complete !"
-        }
-        """)
+        r = Result(id="1", complete=True, result=compress_result({"text": "I am complete !"}))
         db.session.add(r)
         db.session.commit()
 
     def tearDown(self):
+        # wait for the entries added by the test before dropping their table
+        result_batcher.flush()
+        for patch in self.patches:
+            patch.stop()
+
         db.session.remove()
         db.drop_all()
 
@@ -90,6 +124,46 @@ class ResultsTestCase(unittest.TestCase):
         self.assertEqual(result['complete'], True)
         self.assertIn("complete", result["result"]['text'])
 
+    def test_get_result_unknown(self):
+
+        result_id = "unknown"
+        response = self.client.get('/pytket-service/api/v1.0/results/%s' % result_id)
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_result_before_stored(self):
+
+        request = {"impl-url": "https://example.org/circuit.qasm", "impl-language": "OpenQASM",
+                   "provider": "IBMQ", "qpu-name": "ibmq_qasm_simulator"}
+        response = self.client.post('/pytket-service/api/v1.0/execute', json=request)
+        self.assertEqual(response.status_code, 202)
+
+        # the entry is stored with the next batch, the result has to be reported as incomplete until then
+        result_id = response.get_json()['Location'].rpartition('/')[2]
+        response = self.client.get('/pytket-service/api/v1.0/results/%s' % result_id)
+
+        self.assertEqual(response.status_code, 200)
+        result = response.get_json()
+        self.assertEqual(result['id'], result_id)
+        self.assertEqual(result['complete'], False)
+
+        # the job is enqueued once the entry is stored
+        result_batcher.flush()
+        app.execute_queue.enqueue.assert_called_once()
+        self.assertIsNotNone(Result.query.get(result_id))
+
+    def test_get_result_lost(self):
+
+        # an entry that was never stored, e.g. because its process was killed
+        result_id = "lost"
+        app.redis.set(_get_state_key(result_id), PENDING, ex=60)
+        response = self.client.get('/pytket-service/api/v1.0/results/%s' % result_id)
+
+        self.assertEqual(response.status_code, 200)
+        result = response.get_json()
+        self.assertEqual(result['complete'], True)
+        self.assertIn("error", result['result'])
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
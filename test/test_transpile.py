@@ -65,7 +65,7 @@ class TranspileTestCase(unittest.TestCase):
         }
 
         # send the request
-        response = self.client.post('/pytket-service/api/v1.0/transpile',
+        response = self.client.post('/pytket-service/api/v1.0/transpile?sync=true',
                                     json=request)
 
         self.assertEqual(response.status_code, 200)
@@ -87,6 +87,29 @@ class TranspileTestCase(unittest.TestCase):
         # self.assertEqual(r.status_code, 202)
         # print(r.headers.get("Location"))
 
+    def test_transpile_hadamard_simulator_url_async(self):
+        # prepare the request
+        token = qiskit.IBMQ.stored_account()['token']
+        request = {
+            'impl-url': "https://raw.githubusercontent.com/PlanQK/qiskit-service/master/test/data/hadamard.py",
+            'impl-language': 'Qiskit',
+            'qpu-name': "ibmq_qasm_simulator",
+            'provider': "ibmq",
+            'input-params': {
+                'token': {
+                    "rawValue": token,
+                    "type": "Unknown"
+                }
+            }
+        }
+
+        # send the request
+        response = self.client.post('/pytket-service/api/v1.0/transpile',
+                                    json=request)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertIn("/pytket-service/api/v1.0/results/", response.headers.get("Location"))
+
     def test_transpile_hadamard_simulator_file(self):
         # prepare the request
         token = qiskit.IBMQ.stored_account()['token']
@@ -106,7 +129,7 @@ class TranspileTestCase(unittest.TestCase):
         }
 
         # send the request
-        response = self.client.post('/pytket-service/api/v1.0/transpile',
+        response = self.client.post('/pytket-service/api/v1.0/transpile?sync=true',
                                     json=request)
 
         self.assertEqual(response.status_code, 200)
@@ -147,7 +170,7 @@ class TranspileTestCase(unittest.TestCase):
         }
 
         # send the request
-        response = self.client.post('/pytket-service/api/v1.0/transpile',
+        response = self.client.post('/pytket-service/api/v1.0/transpile?sync=true',
                                     json=request)
 
         self.assertEqual(response.status_code, 200)
@@ -187,7 +210,7 @@ class TranspileTestCase(unittest.TestCase):
         }
 
         # send the request
-        response = self.client.post('/pytket-service/api/v1.0/transpile',
+        response = self.client.post('/pytket-service/api/v1.0/transpile?sync=true',
                                     json=request)
 
         self.assertEqual(response.status_code, 200)
@@ -228,7 +251,7 @@ class TranspileTestCase(unittest.TestCase):
         }
 
         # send the request
-        response = self.client.post('/pytket-service/api/v1.0/transpile',
+        response = self.client.post('/pytket-service/api/v1.0/transpile?sync=true',
                                     json=request)
 
         self.assertEqual(response.status_code, 200)
@@ -274,7 +297,7 @@ class TranspileTestCase(unittest.TestCase):
         }
 
         # send the request
-        response = self.client.post('/pytket-service/api/v1.0/transpile',
+        response = self.client.post('/pytket-service/api/v1.0/transpile?sync=true',
                                     json=request)
 
         self.assertEqual(response.status_code, 200)
@@ -318,7 +341,7 @@ class TranspileTestCase(unittest.TestCase):
         }
 
         # send the request
-        response = self.client.post('/pytket-service/api/v1.0/transpile',
+        response = self.client.post('/pytket-service/api/v1.0/transpile?sync=true',
                                     json=request)
 
         self.assertEqual(response.status_code, 200)
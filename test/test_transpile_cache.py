@@ -0,0 +1,54 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import unittest
+from app.parameters import ParameterDictionary, split_credential_parameters
+from app.transpile_cache import get_cache_key
+
+qasm = 'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[1];\nh q[0];\n'
+
+
+class TranspileCacheTestCase(unittest.TestCase):
+
+    @staticmethod
+    def get_key(input_params, bearer_token="", impl_source=qasm):
+        _, compile_params = split_credential_parameters(ParameterDictionary(input_params))
+        return get_cache_key(impl_source, "OpenQASM", compile_params, "IBMQ", "ibmq_qasm_simulator", bearer_token)
+
+    def test_key_ignores_credentials(self):
+        key = self.get_key({'token': {'rawValue': "first-token", 'type': "Unknown"}})
+        rotated_key = self.get_key({'token': {'rawValue': "second-token", 'type': "Unknown"}})
+
+        self.assertEqual(key, rotated_key)
+
+    def test_key_depends_on_bearer_token(self):
+        key = self.get_key({}, bearer_token="first-bearer-token")
+        other_key = self.get_key({}, bearer_token="second-bearer-token")
+
+        self.assertNotEqual(key, other_key)
+
+    def test_key_depends_on_source(self):
+        key = self.get_key({})
+        changed_key = self.get_key({}, impl_source=qasm + "measure q[0] -> c[0];\n")
+
+        self.assertNotEqual(key, changed_key)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import unittest
+import os
+from app.config import basedir
+from app import app, db
+
+
+class ValidationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # setup environment variables for testing
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:///" + os.path.join(basedir, 'test.db')
+
+        self.client = app.test_client()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def test_missing_required_field(self):
+        request = {'impl-url': "https://example.org/circuit.qasm", 'qpu-name': "ibmq_qasm_simulator"}
+        response = self.client.post('/pytket-service/api/v1.0/execute', json=request)
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_body_not_object(self):
+        request = [{'impl-language': 'OpenQASM', 'provider': 'IBMQ', 'qpu-name': 'ibmq_qasm_simulator'}]
+        response = self.client.post('/pytket-service/api/v1.0/transpile', json=request)
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_body_not_json(self):
+        response = self.client.post('/pytket-service/api/v1.0/analyze-original-circuit', data='not json',
+                                    content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_transpile_batch_missing_items(self):
+        response = self.client.post('/pytket-service/api/v1.0/transpile-batch', json={})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_transpile_batch_items_not_list(self):
+        request = {'items': {'impl-language': 'OpenQASM', 'provider': 'IBMQ', 'qpu-name': 'ibmq_qasm_simulator'}}
+        response = self.client.post('/pytket-service/api/v1.0/transpile-batch', json=request)
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_transpile_batch_item_missing_field(self):
+        request = {'items': [{'impl-language': 'OpenQASM', 'provider': 'IBMQ'}]}
+        response = self.client.post('/pytket-service/api/v1.0/transpile-batch', json=request)
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_transpile_batch_item_not_object(self):
+        request = {'items': ['https://example.org/circuit.qasm']}
+        response = self.client.post('/pytket-service/api/v1.0/transpile-batch', json=request)
+
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+# ******************************************************************************
+#  Copyright (c) 2021 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+from rq import SimpleWorker
+
+from app import app
+
+if __name__ == '__main__':
+    # jobs run in this process instead of a work horse forked per job, so the backends configured in
+    # WARM_BACKENDS and the backends, compilation passes and downloads cached by previous jobs are reused
+    SimpleWorker([app.execute_queue], connection=app.redis).work()